@@ -0,0 +1,171 @@
+import os
+import tarfile
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+from io import BytesIO
+from typing import IO, Iterator, Optional, Tuple
+
+from django.core.files import File
+
+from sitemap_generate.generator import SitemapGenerator
+
+
+# mapping: archive file extension -> archive format
+ARCHIVE_FORMATS = {
+    '.tar': 'tar',
+    '.tar.gz': 'tar.gz',
+    '.tgz': 'tar.gz',
+    '.zip': 'zip',
+}
+
+
+def get_format(archive: str) -> str:
+    """
+    Returns archive format guessed from archive file name.
+
+    :raises ValueError: if archive file extension is not supported.
+    """
+    for ext, archive_format in ARCHIVE_FORMATS.items():
+        if archive.endswith(ext):
+            return archive_format
+    raise ValueError(f"Unsupported archive format: {archive}")
+
+
+def get_umask() -> int:
+    """ Returns current process umask."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+@contextmanager
+def atomic_write(path: str) -> Iterator[IO[bytes]]:
+    """
+    Opens a temporary file replacing file at path after successful write.
+
+    Resulting file permissions respect process umask.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    f = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+    try:
+        with f:
+            yield f
+        os.chmod(f.name, 0o666 & ~get_umask())
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+
+class ArchiveSitemapGenerator(SitemapGenerator):
+    """
+    Sitemap generator writing all files of a run into a single archive.
+
+    Archive format (tar, tar.gz or zip) is chosen by archive file extension.
+    """
+
+    def __init__(self, archive: str, upload: bool = False, **kwargs):
+        """
+
+        :param archive: archive path on local disk or on file storage
+        :param upload: save archive to file storage instead of local disk
+        :param kwargs: SitemapGenerator arguments
+        """
+        super().__init__(**kwargs)
+        self.archive = archive
+        self.upload = upload
+        self.format = get_format(archive)
+        self._writer = None
+
+    def generate(self, sitemap=None):
+        """ Generate all sitemap files into an archive."""
+        if self.upload:
+            with tempfile.TemporaryFile() as f:
+                self.write_archive(f, sitemap)
+                f.seek(0)
+                self.logger.debug("Uploading %s...", self.archive)
+                if self.storage.exists(self.archive):
+                    self.storage.delete(self.archive)
+                self.storage.save(self.archive, File(f))
+        else:
+            # archive is moved to target path only if generation succeeds
+            with atomic_write(self.archive) as f:
+                self.write_archive(f, sitemap)
+
+    def write_archive(self, fileobj: IO[bytes], sitemap=None):
+        """ Generate sitemap files into an archive file object."""
+        if self.format == 'zip':
+            self._writer = zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            mode = 'w:gz' if self.format == 'tar.gz' else 'w'
+            self._writer = tarfile.open(fileobj=fileobj, mode=mode)
+        try:
+            super().generate(sitemap)
+        finally:
+            self._writer.close()
+            self._writer = None
+
+    def store_sitemap(self, filename: str, content: bytes):
+        """ Add sitemap content to archive."""
+        if isinstance(self._writer, zipfile.ZipFile):
+            self._writer.writestr(filename, content)
+        else:
+            info = tarfile.TarInfo(filename)
+            info.size = len(content)
+            info.mtime = int(time.time())
+            self._writer.addfile(info, BytesIO(content))
+
+
+def read_archive(fileobj: IO[bytes],
+                 archive_format: str) -> Iterator[Tuple[str, bytes]]:
+    """ Iterates over file names and contents of a sitemap archive."""
+    if archive_format == 'zip':
+        with zipfile.ZipFile(fileobj) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    yield info.filename, zf.read(info)
+    else:
+        with tarfile.open(fileobj=fileobj, mode='r:*') as tar:
+            for member in tar:
+                if member.isfile():
+                    yield member.name, tar.extractfile(member).read()
+
+
+def publish_archive(archive: str,
+                    generator: Optional[SitemapGenerator] = None,
+                    from_storage: bool = False,
+                    directory: Optional[str] = None) -> int:
+    """
+    Stores all files from sitemap archive to sitemap storage or directory.
+
+    :param archive: archive path on local disk or on file storage
+    :param generator: generator used to store sitemap files
+    :param from_storage: read archive from file storage instead of local disk
+    :param directory: local directory to extract files to instead of
+        sitemap storage
+    :returns: number of published files.
+    :raises ValueError: if archive file extension is not supported.
+    """
+    archive_format = get_format(archive)
+    generator = generator or SitemapGenerator()
+    if from_storage:
+        f = generator.storage.open(archive, 'rb')
+    else:
+        f = open(archive, 'rb')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    count = 0
+    with f:
+        for name, content in read_archive(f, archive_format):
+            if name in ('.', '..') or os.path.basename(name) != name:
+                generator.logger.warning("Skipping %s", name)
+                continue
+            if directory:
+                with atomic_write(os.path.join(directory, name)) as target:
+                    target.write(content)
+            else:
+                generator.store_sitemap(name, content)
+            count += 1
+    return count
@@ -37,3 +37,7 @@ SITEMAP_INDEX_NAME = e('SITEMAP_INDEX_NAME', 'sitemap-index')
 # Default name of sitemaps view
 SITEMAPS_VIEW_NAME = e('SITEMAPS_VIEW_NAME',
                        'django.contrib.sitemaps.views.sitemap')
+
+# Age in seconds after which lazily generated sitemap files are refreshed in
+# background, 0 disables refreshing
+SITEMAP_LAZY_TTL = int(e('SITEMAP_LAZY_TTL', 0))
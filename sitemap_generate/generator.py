@@ -1,16 +1,21 @@
 import os
 from io import StringIO
 from logging import getLogger
-from typing import Callable, Dict, Optional, Type
+from typing import Callable, Dict, Iterator, List, Optional, Type
 from urllib.parse import ParseResult, urlparse
 
+import django
 from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.contrib.sites.shortcuts import get_current_site
 from django.core.files.base import ContentFile
 from django.core.files.storage import Storage
+from django.core.handlers.wsgi import WSGIRequest
 from django.core.servers import basehttp
-from django.http import HttpResponse
-from django.urls import reverse
+from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponse
+from django.template.loader import render_to_string
+from django.urls import resolve, reverse
 from django.utils.module_loading import import_string
 
 from sitemap_generate import defaults
@@ -25,6 +30,9 @@ class SitemapError(Exception):
         self.content = content
 
 
+# WSGI environ key marking requests issued by ResponseRecorder
+INTERNAL_REQUEST_KEY = 'sitemap_generate.internal'
+
 StartResponseFunc = Callable[[str, dict], None]
 WSGIFunc = Callable[[dict, StartResponseFunc], HttpResponse]
 
@@ -48,9 +56,18 @@ class ResponseRecorder:
         :returns: response content
         :raises SitemapError: if response status code is not 200.
         """
+        environ = self.get_environ(url)
+        content = b''.join(self.wsgi(environ, self._start_response))
+        if self.status != "200 OK":
+            raise SitemapError(self.status, content)
+        return content
+
+    @staticmethod
+    def get_environ(url: str) -> dict:
+        """ Returns WSGI environ for sitemap url request."""
         url: ParseResult = urlparse(url)
 
-        environ = {
+        return {
             'REQUEST_METHOD': 'GET',
             'wsgi.errors': StringIO(),
             'wsgi.input': StringIO(),
@@ -65,12 +82,9 @@ class ResponseRecorder:
             'SERVER_PORT': defaults.SITEMAP_PORT,
             'PATH_INFO': url.path,
             'QUERY_STRING': url.query,
-            'HTTP_X_FORWARDED_PROTO': defaults.SITEMAP_PROTO
+            'HTTP_X_FORWARDED_PROTO': defaults.SITEMAP_PROTO,
+            INTERNAL_REQUEST_KEY: True,
         }
-        content = b''.join(self.wsgi(environ, self._start_response))
-        if self.status != "200 OK":
-            raise SitemapError(self.status, content)
-        return content
 
     def _start_response(self, status, _):
         """ WSGI headers callback func."""
@@ -118,12 +132,25 @@ class SitemapGenerator:
         self.logger.debug(f"Fetching {url}...")
         return self.recorder.record(url)
 
+    @staticmethod
+    def get_filename(section: Optional[str] = None, page: int = 1) -> str:
+        """ Returns sitemap file name for index or section page."""
+        if section is None:
+            return 'sitemap.xml'
+        if page > 1:
+            return f'sitemap-{section}{page}.xml'
+        return f'sitemap-{section}.xml'
+
     def store_sitemap(self, filename: str, content: bytes):
         """ Save sitemap content to file storage."""
         path = os.path.join(self.sitemap_root, filename)
         if self.storage.exists(path):
             self.storage.delete(path)
-        self.storage.save(path, ContentFile(content))
+        name = self.storage.save(path, ContentFile(content))
+        if name != path:
+            # file was concurrently saved by another process and storage
+            # generated a new name for this copy
+            self.storage.delete(name)
 
     def generate(self, sitemap=None):
         """ Generate all sitemap files."""
@@ -131,13 +158,17 @@ class SitemapGenerator:
         url = reverse(self.index_url_name)
 
         index_content = self.fetch_content(url)
-        self.store_sitemap('sitemap.xml', index_content)
+        self.store_sitemap(self.get_filename(), index_content)
 
         for name, sitemap_class in self.sitemaps.items():
             if sitemap and sitemap != name:
                 continue
             self.logger.debug("Generating sitemap for %s", name)
-            self.generate_pages(name, sitemap_class())
+            sitemap_obj = sitemap_class()
+            if can_render_i18n(sitemap_obj):
+                self.generate_i18n_pages(name, sitemap_obj)
+            else:
+                self.generate_pages(name, sitemap_obj)
 
         self.logger.debug("Finish sitemap generation.")
 
@@ -146,12 +177,101 @@ class SitemapGenerator:
         url = reverse(self.sitemaps_view_name,
                       kwargs={'section': section})
         for page in sitemap.paginator.page_range:
-            if page > 1:
-                page_url = f'{url}?p={page}'
-                filename = f'sitemap-{section}{page}.xml'
-            else:
-                page_url = url
-                filename = f'sitemap-{section}.xml'
-
+            page_url = f'{url}?p={page}' if page > 1 else url
+            filename = self.get_filename(section, page)
             page_content = self.fetch_content(page_url)
             self.store_sitemap(filename, page_content)
+
+    def generate_i18n_pages(self, section: str, sitemap: Sitemap):
+        """
+        Generate multi-language sitemap section pages.
+
+        Sitemap items are queried once for all pages, item locations are
+        computed once per language and shared by all language variants as
+        alternates. Pages are split by sitemap limit same way as django
+        paginator does for (item, language) pairs.
+        """
+        url = reverse(self.sitemaps_view_name,
+                      kwargs={'section': section})
+        request = WSGIRequest(self.recorder.get_environ(url))
+        # same template as configured for sitemap view in urlconf
+        template_name = resolve(url).kwargs.get('template_name',
+                                                'sitemap.xml')
+        protocol = sitemap.get_protocol(request.scheme)
+        domain = sitemap.get_domain(get_current_site(request))
+
+        page = 1
+        urls = []
+        for url_info in iter_i18n_urls(sitemap, protocol, domain):
+            urls.append(url_info)
+            if len(urls) == sitemap.limit:
+                self.store_i18n_page(section, page, urls, request,
+                                     template_name)
+                page += 1
+                urls = []
+        if urls or page == 1:
+            self.store_i18n_page(section, page, urls, request, template_name)
+
+    def store_i18n_page(self, section: str, page: int, urls: List[dict],
+                        request: HttpRequest, template_name: str):
+        """ Render multi-language sitemap page and save it to file storage."""
+        filename = self.get_filename(section, page)
+        self.logger.debug(f"Rendering {filename}...")
+        content = render_to_string(template_name, {'urlset': urls}, request)
+        self.store_sitemap(filename, content.encode(settings.DEFAULT_CHARSET))
+
+
+def can_render_i18n(sitemap: Sitemap) -> bool:
+    """
+    Checks whether i18n sitemap pages could be rendered by generator directly.
+
+    Sitemaps without i18n and sitemaps with custom url generation or pagination are fetched over WSGI
+    as is. Before Django 4.2 sitemap pages are split by language first, so
+    i18n sitemaps are fetched over WSGI too.
+    """
+    if django.VERSION < (4, 2) or not sitemap.i18n:
+        return False
+    cls = type(sitemap)
+    return all(getattr(cls, name) is getattr(Sitemap, name)
+               for name in ('get_urls', '_urls', '_items', 'paginator',
+                            '_location'))
+
+
+def iter_i18n_urls(sitemap: Sitemap, protocol: str,
+                   domain: str) -> Iterator[dict]:
+    """ Yields sitemap urls for all items and languages of sitemap."""
+    items = sitemap.items()
+    if isinstance(items, QuerySet):
+        items = items.iterator(chunk_size=2000)
+    for item in items:
+        languages = sitemap.get_languages_for_item(item)
+        if not languages:
+            continue
+        locations = {
+            lang_code: f"{protocol}://{domain}"
+                       f"{sitemap._location((item, lang_code))}"
+            for lang_code in languages
+        }
+        alternates = []
+        if sitemap.alternates:
+            alternates = [{'location': loc, 'lang_code': lang_code}
+                          for lang_code, loc in locations.items()]
+            if sitemap.x_default and settings.LANGUAGE_CODE in languages:
+                lang_code = settings.LANGUAGE_CODE
+                loc = locations[lang_code].replace(f"/{lang_code}/", "/", 1)
+                alternates.append({'location': loc, 'lang_code': 'x-default'})
+
+        # priority, lastmod and changefreq don't depend on language
+        first = (item, languages[0])
+        priority = sitemap._get('priority', first)
+        lastmod = sitemap._get('lastmod', first)
+        changefreq = sitemap._get('changefreq', first)
+        for lang_code in languages:
+            yield {
+                'item': (item, lang_code),
+                'location': locations[lang_code],
+                'lastmod': lastmod,
+                'changefreq': changefreq,
+                'priority': str(priority if priority is not None else ''),
+                'alternates': alternates,
+            }
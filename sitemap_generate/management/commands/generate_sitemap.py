@@ -1,5 +1,6 @@
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
 
+from sitemap_generate.archive import ArchiveSitemapGenerator
 from sitemap_generate.generator import SitemapGenerator
 
 
@@ -9,7 +10,20 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         super().add_arguments(parser)
         parser.add_argument('sitemap', type=str, nargs='?')
+        parser.add_argument('--archive', type=str,
+                            help="write all files to single tar/zip archive")
+        parser.add_argument('--upload', action='store_true',
+                            help="save archive to sitemap storage")
 
     def handle(self, *args, **options):
-        generator = SitemapGenerator()
+        if options.get('archive'):
+            try:
+                generator = ArchiveSitemapGenerator(options['archive'],
+                                                    upload=options['upload'])
+            except ValueError as e:
+                raise CommandError(e)
+        elif options.get('upload'):
+            raise CommandError("--upload requires --archive")
+        else:
+            generator = SitemapGenerator()
         generator.generate(options.get('sitemap'))
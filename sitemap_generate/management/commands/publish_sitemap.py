@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand, CommandError
+
+from sitemap_generate.archive import publish_archive
+
+
+class Command(BaseCommand):
+    help = "publish sitemap xml files from archive"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('archive', type=str)
+        parser.add_argument('--from-storage', action='store_true',
+                            help="read archive from sitemap storage")
+        parser.add_argument('--directory', type=str,
+                            help="extract files to local directory instead "
+                                 "of sitemap storage")
+
+    def handle(self, *args, **options):
+        try:
+            publish_archive(options['archive'],
+                            from_storage=options['from_storage'],
+                            directory=options.get('directory'))
+        except ValueError as e:
+            raise CommandError(e)
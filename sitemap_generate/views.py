@@ -0,0 +1,193 @@
+import os
+from datetime import timedelta
+from functools import partial
+from threading import Lock, Thread
+from typing import Callable, Dict, Tuple
+
+from django.contrib.sitemaps import views
+from django.core.files.storage import Storage
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.template.response import TemplateResponse
+from django.urls import (get_script_prefix, get_urlconf, set_script_prefix,
+                         set_urlconf)
+from django.utils import timezone, translation
+
+from sitemap_generate import defaults
+from sitemap_generate.generator import (INTERNAL_REQUEST_KEY,
+                                        ResponseRecorder, SitemapGenerator)
+
+RenderFunc = Callable[[], TemplateResponse]
+
+# Default content type of django sitemap views
+DEFAULT_CONTENT_TYPE = 'application/xml'
+
+# Per-file locks preventing concurrent rendering of same sitemap file,
+# mapping: file name -> (lock, number of threads holding or waiting for it)
+_locks: Dict[str, Tuple[Lock, int]] = {}
+_locks_guard = Lock()
+
+
+def acquire(filename: str, blocking: bool = True) -> bool:
+    """
+    Acquires a lock for rendering sitemap file in current process.
+
+    :returns: True if lock is acquired.
+    """
+    with _locks_guard:
+        lock, users = _locks.get(filename, (None, 0))
+        lock = lock or Lock()
+        _locks[filename] = (lock, users + 1)
+    if lock.acquire(blocking):
+        return True
+    _forget(filename)
+    return False
+
+
+def release(filename: str):
+    """ Releases sitemap file lock acquired with `acquire`."""
+    with _locks_guard:
+        _locks[filename][0].release()
+    _forget(filename)
+
+
+def _forget(filename: str):
+    """ Removes sitemap file lock when it is not used by any thread."""
+    with _locks_guard:
+        lock, users = _locks[filename]
+        if users > 1:
+            _locks[filename] = (lock, users - 1)
+        else:
+            del _locks[filename]
+
+
+def index(request: HttpRequest, sitemaps, **kwargs) -> HttpResponse:
+    """
+    Lazy write-through replacement for django sitemap index view.
+
+    Requests issued by SitemapGenerator are passed to django view as is.
+    """
+    if request.META.get(INTERNAL_REQUEST_KEY):
+        return views.index(request, sitemaps, **kwargs)
+    render = partial(views.index, get_render_request(request), sitemaps,
+                     **kwargs)
+    return serve(SitemapGenerator.get_filename(), render,
+                 kwargs.get('content_type', DEFAULT_CONTENT_TYPE))
+
+
+def sitemap(request: HttpRequest, sitemaps, section=None,
+            **kwargs) -> HttpResponse:
+    """
+    Lazy write-through replacement for django sitemap view.
+
+    Requests issued by SitemapGenerator and requests which can't be mapped
+    to a sitemap file are passed to django view as is.
+    """
+    page = request.GET.get('p', '1')
+    if (request.META.get(INTERNAL_REQUEST_KEY) or
+            section not in sitemaps or
+            not page.isdecimal() or int(page) < 1):
+        return views.sitemap(request, sitemaps, section=section, **kwargs)
+    render = partial(views.sitemap, get_render_request(request), sitemaps,
+                     section=section, **kwargs)
+    return serve(SitemapGenerator.get_filename(section, int(page)), render,
+                 kwargs.get('content_type', DEFAULT_CONTENT_TYPE))
+
+
+def get_render_request(request: HttpRequest) -> HttpRequest:
+    """
+    Returns request for rendering sitemap file shared by all clients.
+
+    Host and protocol are taken from settings same as for SitemapGenerator,
+    not from incoming request.
+    """
+    environ = ResponseRecorder.get_environ(request.get_full_path_info())
+    environ['SCRIPT_NAME'] = request.META.get('SCRIPT_NAME', '')
+    return WSGIRequest(environ)
+
+
+def serve(filename: str, render: RenderFunc,
+          content_type: str = DEFAULT_CONTENT_TYPE) -> HttpResponse:
+    """
+    Serves sitemap file from storage, rendering it on first request.
+
+    :param filename: sitemap file name
+    :param render: django sitemap view call
+    :param content_type: content type of stored sitemap response
+    :returns: stored or rendered sitemap content.
+    """
+    generator = SitemapGenerator()
+    storage = generator.storage
+    path = os.path.join(generator.sitemap_root, filename)
+
+    if storage.exists(path):
+        try:
+            if is_stale(storage, path):
+                refresh(generator, filename, render)
+            return read_sitemap(storage, path, content_type)
+        except FileNotFoundError:
+            # file is being replaced by background refresh
+            pass
+
+    acquire(filename)
+    try:
+        if storage.exists(path):
+            return read_sitemap(storage, path, content_type)
+        response = render().render()
+        generator.store_sitemap(filename, response.content)
+        return response
+    finally:
+        release(filename)
+
+
+def read_sitemap(storage: Storage, path: str,
+                 content_type: str) -> HttpResponse:
+    """ Returns response with sitemap content read from storage."""
+    with storage.open(path) as f:
+        response = HttpResponse(f.read(), content_type=content_type)
+    # same header as set by django sitemap views
+    response['X-Robots-Tag'] = 'noindex, noodp, noarchive'
+    return response
+
+
+def is_stale(storage: Storage, path: str) -> bool:
+    """ Checks whether stored sitemap file is older than configured TTL."""
+    ttl = defaults.SITEMAP_LAZY_TTL
+    if not ttl:
+        return False
+    try:
+        modified = storage.get_modified_time(path)
+    except NotImplementedError:
+        return False
+    return timezone.now() - modified > timedelta(seconds=ttl)
+
+
+def refresh(generator: SitemapGenerator, filename: str, render: RenderFunc):
+    """
+    Re-renders sitemap file in background thread.
+
+    Does nothing if same file is already being rendered.
+    """
+    if not acquire(filename, blocking=False):
+        return
+    # thread-local request state used by sitemap views
+    script_prefix = get_script_prefix()
+    urlconf = get_urlconf()
+    language = translation.get_language()
+
+    def run():
+        set_script_prefix(script_prefix)
+        set_urlconf(urlconf)
+        try:
+            with translation.override(language):
+                content = render().render().content
+            generator.store_sitemap(filename, content)
+        except Exception:
+            generator.logger.exception("Failed to refresh %s", filename)
+        finally:
+            release(filename)
+            connections.close_all()
+
+    Thread(target=run, name=f'sitemap-refresh-{filename}',
+           daemon=True).start()
@@ -1,4 +1,5 @@
 from django.contrib.sitemaps import Sitemap
+from django.utils.translation import get_language
 
 from testproject.testapp import models
 
@@ -19,3 +20,19 @@ class ArticleSitemap(Sitemap):
 
     def items(self):
         return models.Article.objects.order_by('id')
+
+
+class LocalizedVideoSitemap(Sitemap):
+    name = 'localized'
+    changefreq = 'daily'
+    limit = 3
+    i18n = True
+    languages = ['en', 'ru']
+    alternates = True
+    x_default = True
+
+    def items(self):
+        return models.Video.objects.order_by('id')
+
+    def location(self, item):
+        return f'/{get_language()}{item.get_absolute_url()}'
@@ -1,15 +1,25 @@
 import os
+import tarfile
+import tempfile
+import threading
+import time
+from io import BytesIO
 from typing import cast
+from unittest import mock, skipIf
 
 import django
+from django.contrib.sitemaps import views as sitemap_views
+from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage, Storage
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
 from django.test import TestCase, override_settings
+from django.urls import clear_script_prefix, path, set_script_prefix
 from django_testing_utils.utils import override_defaults
 
-from sitemap_generate import defaults
-from sitemap_generate.generator import SitemapGenerator
+from sitemap_generate import defaults, views
+from sitemap_generate.generator import SitemapGenerator, can_render_i18n
 from testproject.testapp import models, sitemaps
+from testproject.testapp.urls import sitemaps as sitemap_sections
 
 
 # noinspection PyAbstractClass
@@ -22,6 +32,23 @@ test_storage = TestStorage()
 
 sitemap_mapping = {'videos': sitemaps.VideoSitemap}
 
+urlpatterns = [
+    path('sitemaps/sitemap.xml', views.index, {'sitemaps': sitemap_sections},
+         name='sitemap-index'),
+    path('sitemaps/sitemap-<section>.xml', views.sitemap,
+         {'sitemaps': sitemap_sections},
+         name='django.contrib.sitemaps.views.sitemap'),
+    path('custom/sitemap-<section>.xml', sitemap_views.sitemap,
+         {'sitemaps': sitemap_sections, 'template_name': 'custom_sitemap.xml'},
+         name='custom-sitemap'),
+    path('text/sitemap-<section>.xml', views.sitemap,
+         {'sitemaps': sitemap_sections, 'content_type': 'text/xml'},
+         name='text-sitemap'),
+    path('articles/sitemap.xml', views.index,
+         {'sitemaps': {'articles': sitemaps.ArticleSitemap}},
+         name='articles-index'),
+]
+
 
 class GenerateSitemapCommandTestCase(TestCase):
     if django.VERSION >= (3, 2):
@@ -92,6 +119,155 @@ class GenerateSitemapCommandTestCase(TestCase):
         self.assertTrue(self.storage.exists('sitemaps/sitemap-video.xml'))
         self.assertFalse(self.storage.exists('sitemaps/sitemap-articles.xml'))
 
+    def assert_archive_published(self, archive: str):
+        """ Generates sitemap archive and publishes it to storage."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, archive)
+            call_command('generate_sitemap', archive=path)
+            self.assertFalse(self.storage.exists('sitemaps/sitemap.xml'))
+
+            call_command('publish_sitemap', path)
+
+        for name in ['sitemap.xml', 'sitemap-video.xml',
+                     'sitemap-video2.xml', 'sitemap-articles.xml']:
+            self.assertTrue(self.storage.exists(f'sitemaps/{name}'))
+        with self.storage.open('sitemaps/sitemap-articles.xml') as f:
+            content = f.read().decode('utf-8').splitlines()
+            self.assertListEqual(content, self.empty)
+
+    def test_generate_tar_archive(self):
+        """ Sitemap files may be written to tar archive and published."""
+        self.assert_archive_published('sitemaps.tar')
+
+    def test_generate_tar_gz_archive(self):
+        """ Sitemap files may be written to tar.gz archive and published."""
+        self.assert_archive_published('sitemaps.tar.gz')
+
+    def test_generate_zip_archive(self):
+        """ Sitemap files may be written to zip archive and published."""
+        self.assert_archive_published('sitemaps.zip')
+
+    def test_archive_permissions(self):
+        """ Archive file permissions respect process umask."""
+        umask = os.umask(0o022)
+        self.addCleanup(os.umask, umask)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sitemaps.tar')
+            call_command('generate_sitemap', archive=path)
+
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+
+    def test_publish_to_directory(self):
+        """ Archive may be published to local directory."""
+        archive = 'sitemaps/sitemaps.tar.gz'
+        call_command('generate_sitemap', archive=archive, upload=True)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, 'sitemaps')
+            call_command('publish_sitemap', archive, from_storage=True,
+                         directory=directory)
+
+            self.assertListEqual(
+                sorted(os.listdir(directory)),
+                ['sitemap-articles.xml', 'sitemap-localized.xml',
+                 'sitemap-localized2.xml', 'sitemap-video.xml',
+                 'sitemap-video2.xml', 'sitemap.xml'])
+            with open(os.path.join(directory, 'sitemap-articles.xml')) as f:
+                self.assertListEqual(f.read().splitlines(), self.empty)
+        self.assertFalse(self.storage.exists('sitemaps/sitemap.xml'))
+
+    def test_generate_archive_failure(self):
+        """ Incomplete archive is not left at target path."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sitemaps.tar')
+            with mock.patch.object(SitemapGenerator, 'generate_pages',
+                                   side_effect=RuntimeError()):
+                with self.assertRaises(RuntimeError):
+                    call_command('generate_sitemap', archive=path)
+            self.assertListEqual(os.listdir(tmp), [])
+
+    def test_archive_arguments(self):
+        """ Unsupported archive formats and upload without archive fail."""
+        with self.assertRaises(CommandError):
+            call_command('generate_sitemap', archive='sitemaps.tar.xz')
+        with self.assertRaises(CommandError):
+            call_command('generate_sitemap', upload=True)
+        with self.assertRaises(CommandError):
+            call_command('publish_sitemap', 'sitemaps.tar.bz2')
+
+    def test_upload_archive(self):
+        """ Sitemap archive may be saved to and published from storage."""
+        archive = 'sitemaps/sitemaps.tar.gz'
+        call_command('generate_sitemap', 'video', archive=archive,
+                     upload=True)
+        self.assertTrue(self.storage.exists(archive))
+        self.assertFalse(self.storage.exists('sitemaps/sitemap-video.xml'))
+
+        call_command('publish_sitemap', archive, from_storage=True)
+
+        self.assertTrue(self.storage.exists('sitemaps/sitemap.xml'))
+        self.assertTrue(self.storage.exists('sitemaps/sitemap-video2.xml'))
+        self.assertFalse(self.storage.exists('sitemaps/sitemap-articles.xml'))
+
+    def test_publish_skips_nested_paths(self):
+        """ Archive members outside of sitemap directory are not published."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sitemaps.tar')
+            with tarfile.open(path, 'w') as tar:
+                for name in ['../sitemap.xml', 'sitemap-video.xml']:
+                    info = tarfile.TarInfo(name)
+                    info.size = 3
+                    tar.addfile(info, BytesIO(b'xml'))
+
+            with self.assertLogs('sitemap_generate', 'WARNING'):
+                call_command('publish_sitemap', path)
+
+        self.assertFalse(self.storage.exists('sitemap.xml'))
+        self.assertTrue(self.storage.exists('sitemaps/sitemap-video.xml'))
+
+    def test_generate_i18n_sitemap(self):
+        """ Multi-language sitemap pages are same as rendered by django."""
+        models.Video.objects.create()
+        generator = SitemapGenerator()
+        call_command('generate_sitemap', sitemap='localized')
+
+        # 3 videos x 2 languages are split to 2 pages by 3 urls
+        for page, filename in [(1, 'sitemap-localized.xml'),
+                               (2, 'sitemap-localized2.xml')]:
+            with self.subTest(page=page):
+                url = f'/sitemaps/sitemap-localized.xml?p={page}'
+                expected = generator.fetch_content(url)
+                with self.storage.open(f'sitemaps/{filename}') as f:
+                    content = f.read()
+                self.assertEqual(content, expected)
+                self.assertEqual(content.count(b'<url>'), 3)
+        self.assertFalse(
+            self.storage.exists('sitemaps/sitemap-localized3.xml'))
+
+        with self.storage.open('sitemaps/sitemap-localized.xml') as f:
+            content = f.read().decode('utf-8')
+        self.assertIn('hreflang="ru" href="https://localhost/ru/videos/',
+                      content)
+        self.assertIn('hreflang="x-default" '
+                      'href="https://localhost/videos/', content)
+
+    @override_settings(ROOT_URLCONF='testproject.testapp.tests')
+    def test_generate_i18n_sitemap_template(self):
+        """ Multi-language sitemap pages use template from urlconf."""
+        generator = SitemapGenerator(sitemaps_view_name='custom-sitemap')
+        generator.generate_pages = mock.Mock()
+        section = sitemaps.LocalizedVideoSitemap.name
+
+        generator.generate(section)
+
+        if django.VERSION >= (4, 2):
+            generator.generate_pages.assert_not_called()
+            expected = generator.fetch_content(f'/custom/sitemap-{section}.xml')
+            with self.storage.open(f'sitemaps/sitemap-{section}.xml') as f:
+                self.assertEqual(f.read(), expected)
+        else:
+            generator.generate_pages.assert_called_once()
+
 
 class SitemapGeneratorTestCase(TestCase):
 
@@ -109,6 +285,198 @@ class SitemapGeneratorTestCase(TestCase):
         sg = SitemapGenerator()
         self.assertIs(sg.sitemaps['videos'], sitemaps.VideoSitemap)
 
+    def test_store_sitemap_concurrently(self):
+        """ Sitemap file saved concurrently by another process is kept."""
+        storage = cast(Storage, default_storage)
+        self.addCleanup(storage.delete, 'sitemaps/sitemap.xml')
+        storage.save('sitemaps/sitemap.xml', ContentFile(b'xml'))
+        sg = SitemapGenerator(storage=storage)
+
+        # another process saves the file after existence check
+        exists = storage.exists
+        side_effect = [False]
+
+        def concurrent_exists(name):
+            return side_effect.pop() if side_effect else exists(name)
+
+        with mock.patch.object(storage, 'exists',
+                               side_effect=concurrent_exists):
+            sg.store_sitemap('sitemap.xml', b'new')
+
+        _, files = storage.listdir('sitemaps')
+        self.assertListEqual(files, ['sitemap.xml'])
+
     def test_init_sitemaps_from_args(self):
         sg = SitemapGenerator(sitemaps=sitemap_mapping)
         self.assertIs(sg.sitemaps['videos'], sitemaps.VideoSitemap)
+
+
+@override_settings(ROOT_URLCONF='testproject.testapp.tests')
+class LazySitemapViewsTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.videos = [models.Video.objects.create() for _ in range(2)]
+        cls.storage = cast(Storage, default_storage)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        _, files = self.storage.listdir('sitemaps')
+        for path in files:
+            self.storage.delete(os.path.join('sitemaps', path))
+
+    def test_render_missing_files(self):
+        """ Missing sitemap files are rendered and stored on first request."""
+        for url, filename in [
+            ('/sitemaps/sitemap.xml', 'sitemaps/sitemap.xml'),
+            ('/sitemaps/sitemap-video.xml', 'sitemaps/sitemap-video.xml'),
+            ('/sitemaps/sitemap-video.xml?p=2', 'sitemaps/sitemap-video2.xml'),
+        ]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], 'application/xml')
+                with self.storage.open(filename) as f:
+                    self.assertEqual(response.content, f.read())
+
+        with self.storage.open('sitemaps/sitemap-video2.xml') as f:
+            self.assertIn(f'/videos/{self.videos[1].pk}/',
+                          f.read().decode('utf-8'))
+
+    def test_serve_stored_files(self):
+        """ Stored sitemap files are served without rendering."""
+        self.storage.save('sitemaps/sitemap-video.xml', ContentFile(b'xml'))
+
+        response = self.client.get('/sitemaps/sitemap-video.xml')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'xml')
+
+    def test_invalid_pages(self):
+        """ Invalid sitemap pages are not stored."""
+        for url in ['/sitemaps/sitemap-video.xml?p=3',
+                    '/sitemaps/sitemap-video.xml?p=0',
+                    '/sitemaps/sitemap-video.xml?p=x',
+                    '/sitemaps/sitemap-video.xml?p=%C2%B2',
+                    '/sitemaps/sitemap-missing.xml']:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+        _, files = self.storage.listdir('sitemaps')
+        self.assertListEqual(files, [])
+        self.assertDictEqual(views._locks, {})
+
+    def join_refresh(self, filename: str):
+        """ Waits for background refresh of sitemap file."""
+        for thread in threading.enumerate():
+            if thread.name == f'sitemap-refresh-{filename}':
+                thread.join()
+
+    @override_settings(ALLOWED_HOSTS=['*'])
+    def test_render_with_settings_host(self):
+        """ Sitemap files links don't depend on requester host."""
+        response = self.client.get('/sitemaps/sitemap-video.xml',
+                                   HTTP_HOST='mirror.example.org')
+
+        self.assertEqual(response.status_code, 200)
+        with self.storage.open('sitemaps/sitemap-video.xml') as f:
+            content = f.read().decode('utf-8')
+        self.assertIn(f'<loc>https://localhost/videos/{self.videos[0].pk}/',
+                      content)
+        self.assertNotIn('mirror.example.org', content)
+
+    def test_content_type(self):
+        """ Content type passed to sitemap view is used for stored files."""
+        for _ in range(2):
+            response = self.client.get('/text/sitemap-video.xml')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'text/xml')
+
+    def test_script_prefix(self):
+        """ Sitemap files are rendered for site deployed under prefix."""
+        set_script_prefix('/app/')
+        self.addCleanup(clear_script_prefix)
+
+        response = self.client.get('/sitemaps/sitemap.xml')
+
+        self.assertEqual(response.status_code, 200)
+        with self.storage.open('sitemaps/sitemap.xml') as f:
+            link = 'https://localhost/app/sitemaps/sitemap-video.xml'
+            self.assertIn(f'<loc>{link}</loc>', f.read().decode('utf-8'))
+
+    @override_defaults('sitemap_generate', SITEMAP_LAZY_TTL=60)
+    def test_refresh_script_prefix(self):
+        """ Sitemap files are refreshed for site deployed under prefix."""
+        set_script_prefix('/app/')
+        self.addCleanup(clear_script_prefix)
+        filename = 'sitemaps/sitemap.xml'
+        self.storage.save(filename, ContentFile(b'xml'))
+        modified = time.time() - 120
+        os.utime(self.storage.path(filename), (modified, modified))
+
+        # articles index doesn't query videos locked by test transaction
+        response = self.client.get('/articles/sitemap.xml')
+
+        self.assertEqual(response.content, b'xml')
+        self.join_refresh('sitemap.xml')
+        with self.storage.open(filename) as f:
+            link = 'https://localhost/app/sitemaps/sitemap-articles.xml'
+            self.assertIn(f'<loc>{link}</loc>', f.read().decode('utf-8'))
+
+    def test_serve_replaced_file(self):
+        """ File replaced by background refresh is served after refresh."""
+        self.storage.save('sitemaps/sitemap-video.xml', ContentFile(b'xml'))
+        read_sitemap = views.read_sitemap
+        calls = []
+
+        def replaced(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise FileNotFoundError()
+            return read_sitemap(*args)
+
+        with mock.patch('sitemap_generate.views.read_sitemap',
+                        side_effect=replaced):
+            response = self.client.get('/sitemaps/sitemap-video.xml')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'xml')
+        self.assertEqual(len(calls), 2)
+
+    @override_defaults('sitemap_generate', SITEMAP_LAZY_TTL=60)
+    def test_refresh_stale_files(self):
+        """ Stale sitemap files are served and refreshed in background."""
+        filename = 'sitemaps/sitemap-articles.xml'
+        self.storage.save(filename, ContentFile(b'xml'))
+        modified = time.time() - 120
+        os.utime(self.storage.path(filename), (modified, modified))
+
+        response = self.client.get('/sitemaps/sitemap-articles.xml')
+
+        self.assertEqual(response.content, b'xml')
+        self.join_refresh('sitemap-articles.xml')
+        with self.storage.open(filename) as f:
+            self.assertIn(b'<urlset', f.read())
+
+
+class I18nSitemapTestCase(TestCase):
+
+    @skipIf(django.VERSION < (4, 2), "i18n pages are split by language")
+    def test_can_render_i18n(self):
+        """ Multi-language sitemaps are rendered by generator."""
+        self.assertTrue(can_render_i18n(sitemaps.LocalizedVideoSitemap()))
+
+    def test_cannot_render_i18n(self):
+        """ Sitemaps with custom pagination or locations are fetched."""
+        self.assertFalse(can_render_i18n(sitemaps.VideoSitemap()))
+        for name in ['get_urls', '_urls', '_items', 'paginator', '_location']:
+            with self.subTest(name=name):
+                def override(*_):
+                    return None
+
+                if name == 'paginator':
+                    override = property(override)
+                sitemap_class = type('CustomSitemap',
+                                     (sitemaps.LocalizedVideoSitemap,),
+                                     {name: override})
+                self.assertFalse(can_render_i18n(sitemap_class()))
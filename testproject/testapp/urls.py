@@ -1,11 +1,13 @@
 from django.contrib.sitemaps import views
 from django.urls import path
 
-from testproject.testapp.sitemaps import VideoSitemap, ArticleSitemap
+from testproject.testapp.sitemaps import (VideoSitemap, ArticleSitemap,
+                                           LocalizedVideoSitemap)
 
 sitemaps = {
     VideoSitemap.name: VideoSitemap,
-    ArticleSitemap.name: ArticleSitemap
+    ArticleSitemap.name: ArticleSitemap,
+    LocalizedVideoSitemap.name: LocalizedVideoSitemap,
 }
 
 urlpatterns = [